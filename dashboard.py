@@ -13,47 +13,93 @@
 import streamlit as st
 import yfinance as yf
 import pandas as pd
+import numpy as np
+from tsdownsample import NaNMinMaxLTTBDownsampler
 import plotly.graph_objects as go
 import ollama
-import tempfile
+from indicators_aot import compute_indicators
 import base64
-import os
 
 # Set up Streamlit app
 st.set_page_config(layout="wide")
 st.title("The ChatGippity Stock Analysis Dashboard")
 st.sidebar.header("Configuration")
 
+OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _fetch(ticker, start, end):
+    """Download OHLCV data, cached per (ticker, start, end) for an hour."""
+    df = yf.download(ticker, start=start, end=end)
+    # float32 is plenty for charting and indicator math and halves memory
+    return df[OHLCV].astype('float32')
+
+INDICATOR_KEYS = ("sma", "ema", "bb_upper", "bb_lower", "vwap", "rsi", "macd", "signal")
+
+@st.cache_data(show_spinner=False)
+def compute_all(close: np.ndarray, volume: np.ndarray, window=20, ema_span=20,
+                macd_fast=12, macd_slow=26, macd_sig=9, rsi_win=14):
+    """Run the indicator kernel, cached on the raw Close/Volume arrays."""
+    # The compiled signature wants writable float64 arrays and every argument
+    # passed positionally
+    close = np.array(close, dtype=np.float64)
+    volume = np.array(volume, dtype=np.float64)
+    result = compute_indicators(close, volume, window, ema_span, macd_fast, macd_slow, macd_sig, rsi_win)
+    return dict(zip(INDICATOR_KEYS, result))
+
+def calculate_rsi(data, window=14):
+    """Calculate RSI for the given data."""
+    rsi = compute_all(data['Close'].values, data['Volume'].values, rsi_win=window)["rsi"]
+    return pd.Series(rsi, index=data.index)
+
+def calculate_macd(data):
+    """Calculate MACD and signal line."""
+    ind = compute_all(data['Close'].values, data['Volume'].values)
+    return pd.Series(ind["macd"], index=data.index), pd.Series(ind["signal"], index=data.index)
+
+# Long ranges are downsampled to about this many points per trace before plotting
+MAX_POINTS = 2000
+DOWNSAMPLE_MIN_ROWS = 3000
+
+def downsample_line(x, y, n_out=MAX_POINTS):
+    """Keep a visually lossless MinMaxLTTB subset of a line trace."""
+    if len(y) < DOWNSAMPLE_MIN_ROWS:
+        return x, y
+    idx = NaNMinMaxLTTBDownsampler().downsample(np.ascontiguousarray(y), n_out=n_out).astype(np.intp)
+    return x[idx], y[idx]
+
+def downsample_ohlc(data, n_out=MAX_POINTS):
+    """Merge consecutive candles into bins, keeping each bin's high/low extremes."""
+    x = data.index
+    o, h, l, c = (data[col].values for col in ('Open', 'High', 'Low', 'Close'))
+    if len(data) < DOWNSAMPLE_MIN_ROWS:
+        return x, o, h, l, c
+    step = -(-len(data) // n_out)
+    starts = np.arange(0, len(data), step)
+    ends = np.minimum(starts + step, len(data)) - 1
+    return x[starts], o[starts], np.maximum.reduceat(h, starts), np.minimum.reduceat(l, starts), c[ends]
+
+@st.cache_data(show_spinner=False)
+def render_png(ticker: str, indicators: tuple, close_hash: int, start, end, _fig) -> bytes:
+    """Rasterize the chart with Kaleido. _fig is left out of the cache key."""
+    # The vision model downscales large images anyway, so render close to its
+    # working size: 896x560 for the default 800px-tall layout
+    return _fig.to_image(format='png', width=896, height=round(_fig.layout.height * 0.7), scale=1)
+
 # Input for stock ticker and date range
 ticker = st.sidebar.text_input("Enter Stock Ticker (e.g., NVDA):", "NVDA")
-start_date = st.sidebar.date_input("Start Date", value=pd.Timestamp.now() - pd.DateOffset(years=1))
-end_date = st.sidebar.date_input("End Date", value=pd.Timestamp.now())
+start_date = st.sidebar.date_input("Start Date", value=(pd.Timestamp.now() - pd.DateOffset(years=1)).date())
+end_date = st.sidebar.date_input("End Date", value=pd.Timestamp.now().date())
 
 # Fetch stock data
 if st.sidebar.button("Fetch Data"):
-    st.session_state["stock_data"] = yf.download(ticker, start=start_date, end=end_date)
+    st.session_state["stock_data"] = _fetch(ticker, start_date, end_date)
     st.success("Stock data loaded successfully!")
 
 # Check if data is available
 if "stock_data" in st.session_state:
     data = st.session_state["stock_data"]
 
-    # Plot candlestick chart
-    fig = go.Figure(data=[
-        go.Candlestick(
-            x=data.index,
-            open=data['Open'],
-            high=data['High'],
-            low=data['Low'],
-            close=data['Close'],
-            name="Candlestick",
-            increasing_line_color='#26A69A',
-            decreasing_line_color='#EF5350',
-            increasing_fillcolor='#26A69A',
-            decreasing_fillcolor='#EF5350'
-        )
-    ])
-
     # Sidebar: Select technical indicators
     st.sidebar.subheader("Technical Indicators")
     indicators = st.sidebar.multiselect(
@@ -62,135 +108,129 @@ if "stock_data" in st.session_state:
         default=["20-Day SMA"]
     )
 
-    def calculate_rsi(data, window=14):
-        """Calculate RSI for the given data."""
-        delta = data['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-        rs = gain / loss
-        return 100 - (100 / (1 + rs))
-
-    def calculate_macd(data):
-        """Calculate MACD and signal line."""
-        exp1 = data['Close'].ewm(span=12, adjust=False).mean()
-        exp2 = data['Close'].ewm(span=26, adjust=False).mean()
-        macd = exp1 - exp2
-        signal = macd.ewm(span=9, adjust=False).mean()
-        return macd, signal
-
-    # Helper function to add indicators to the chart
-    def add_indicator(indicator):
-        if indicator == "20-Day SMA":
-            sma = data['Close'].rolling(window=20).mean()
-            fig.add_trace(go.Scatter(x=data.index, y=sma, mode='lines', name='SMA (20)'))
-        elif indicator == "20-Day EMA":
-            ema = data['Close'].ewm(span=20).mean()
-            fig.add_trace(go.Scatter(x=data.index, y=ema, mode='lines', name='EMA (20)'))
-        elif indicator == "20-Day Bollinger Bands":
-            sma = data['Close'].rolling(window=20).mean()
-            std = data['Close'].rolling(window=20).std()
-            bb_upper = sma + 2 * std
-            bb_lower = sma - 2 * std
-            fig.add_trace(go.Scatter(x=data.index, y=bb_upper, mode='lines', name='BB Upper'))
-            fig.add_trace(go.Scatter(x=data.index, y=bb_lower, mode='lines', name='BB Lower'))
-        elif indicator == "VWAP":
-            data['VWAP'] = (data['Close'] * data['Volume']).cumsum() / data['Volume'].cumsum()
-            fig.add_trace(go.Scatter(x=data.index, y=data['VWAP'], mode='lines', name='VWAP'))
-        elif indicator == "RSI":
-            rsi = calculate_rsi(data)
-            fig.add_trace(go.Scatter(x=data.index, y=rsi, mode='lines', 
-                                   name='RSI', yaxis='y2'))
-            
-            fig.add_trace(go.Scatter(
-                x=[data.index[0], data.index[-1]],
-                y=[70, 70],
-                mode='lines',
-                line=dict(dash='dash', color='red', width=1),
-                name='Overbought',
-                yaxis='y2'
-            ))
-            
-            fig.add_trace(go.Scatter(
-                x=[data.index[0], data.index[-1]],
-                y=[30, 30],
-                mode='lines',
-                line=dict(dash='dash', color='green', width=1),
-                name='Oversold',
-                yaxis='y2'
-            ))
-        elif indicator == "MACD":
-            macd, signal = calculate_macd(data)
-            fig.add_trace(go.Scatter(x=data.index, y=macd, mode='lines', 
-                                   name='MACD', yaxis='y3'))
-            fig.add_trace(go.Scatter(x=data.index, y=signal, mode='lines', 
-                                   name='Signal', yaxis='y3'))
-
-    # Add selected indicators to the chart
-    for indicator in indicators:
-        add_indicator(indicator)
-
-    fig.update_layout(xaxis_rangeslider_visible=False)
-    fig.update_layout(
-        xaxis_rangeslider_visible=False,
-        yaxis=dict(gridcolor='#31333F'),
-        xaxis=dict(gridcolor='#31333F')
-    )
-
-    # Update layout based on selected indicators
-    layout_update = {
-        'height': 800,
-        'yaxis': dict(domain=[0.6, 1]),
-        'title': f"{ticker} Performance Chart ({start_date.strftime('%Y-%m-%d')} - {end_date.strftime('%Y-%m-%d')})"
-    }
-
-    if "RSI" in indicators and "MACD" in indicators:
-        layout_update.update({
-            'height': 1000,
-            'yaxis2': dict(title="RSI", domain=[0.35, 0.55]),
-            'yaxis3': dict(title="MACD", domain=[0.1, 0.3])
-        })
-    elif "RSI" in indicators:
-        layout_update.update({
-            'yaxis2': dict(title="RSI", domain=[0.1, 0.3])
-        })
-    elif "MACD" in indicators:
-        layout_update.update({
-            'yaxis3': dict(title="MACD", domain=[0.1, 0.3])
-        })
-
-    fig.update_layout(**layout_update)
-
-    st.plotly_chart(fig)
+    # Rebuilding the figure is skipped on reruns that don't change its inputs
+    close_hash = hash(data['Close'].values.tobytes())
+    fig_key = (ticker, start_date, end_date, tuple(indicators), close_hash)
+    if st.session_state.get("fig_key") == fig_key:
+        fig = st.session_state["fig"]
+    else:
+        # Plot candlestick chart
+        x, o, h, l, c = downsample_ohlc(data)
+        fig = go.Figure(data=[
+            go.Candlestick(
+                x=x,
+                open=o,
+                high=h,
+                low=l,
+                close=c,
+                name="Candlestick",
+                increasing_line_color='#26A69A',
+                decreasing_line_color='#EF5350',
+                increasing_fillcolor='#26A69A',
+                decreasing_fillcolor='#EF5350'
+            )
+        ])
+
+        ind = compute_all(data['Close'].values, data['Volume'].values)
+
+        def add_line(y, name, **kwargs):
+            x, y = downsample_line(data.index, y)
+            fig.add_trace(go.Scattergl(x=x, y=y, mode='lines', name=name, **kwargs))
+
+        # Helper function to add indicators to the chart
+        def add_indicator(indicator):
+            if indicator == "20-Day SMA":
+                add_line(ind["sma"], 'SMA (20)')
+            elif indicator == "20-Day EMA":
+                add_line(ind["ema"], 'EMA (20)')
+            elif indicator == "20-Day Bollinger Bands":
+                add_line(ind["bb_upper"], 'BB Upper')
+                add_line(ind["bb_lower"], 'BB Lower')
+            elif indicator == "VWAP":
+                add_line(ind["vwap"], 'VWAP')
+            elif indicator == "RSI":
+                add_line(ind["rsi"], 'RSI', yaxis='y2')
+                st.session_state["rsi"] = pd.Series(ind["rsi"], index=data.index)
+
+                fig.add_hline(y=70, line=dict(dash='dash', color='red', width=1), yref='y2',
+                              annotation_text='Overbought', annotation_position='right')
+                fig.add_hline(y=30, line=dict(dash='dash', color='green', width=1), yref='y2',
+                              annotation_text='Oversold', annotation_position='right')
+            elif indicator == "MACD":
+                add_line(ind["macd"], 'MACD', yaxis='y3')
+                add_line(ind["signal"], 'Signal', yaxis='y3')
+                st.session_state["macd"] = pd.Series(ind["macd"], index=data.index)
+                st.session_state["signal"] = pd.Series(ind["signal"], index=data.index)
+
+        # Add selected indicators to the chart
+        for indicator in indicators:
+            add_indicator(indicator)
+
+        # Build the layout based on selected indicators and apply it in one call
+        layout_update = {
+            'xaxis_rangeslider_visible': False,
+            'xaxis': dict(gridcolor='#31333F'),
+            'yaxis': dict(gridcolor='#31333F', domain=[0.6, 1]),
+            'height': 800,
+            'title': f"{ticker} Performance Chart ({start_date.strftime('%Y-%m-%d')} - {end_date.strftime('%Y-%m-%d')})"
+        }
+
+        if "RSI" in indicators and "MACD" in indicators:
+            layout_update.update({
+                'height': 1000,
+                'yaxis2': dict(title="RSI", domain=[0.35, 0.55]),
+                'yaxis3': dict(title="MACD", domain=[0.1, 0.3])
+            })
+        elif "RSI" in indicators:
+            layout_update.update({
+                'yaxis2': dict(title="RSI", domain=[0.1, 0.3])
+            })
+        elif "MACD" in indicators:
+            layout_update.update({
+                'yaxis3': dict(title="MACD", domain=[0.1, 0.3])
+            })
+
+        fig.update_layout(**layout_update)
+
+        st.session_state["fig_key"] = fig_key
+        st.session_state["fig"] = fig
+
+    st.plotly_chart(fig, use_container_width=True, theme=None,
+                    config={'staticPlot': False, 'displaylogo': False})
 
     # Analyze chart with LLaMA 3.2 Vision
     st.subheader("AI-Powered Analysis")
     if st.button("Run AI Analysis"):
         with st.spinner("Analyzing the chart, please wait..."):
-            with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmpfile:
-                fig.write_image(tmpfile.name)
-                tmpfile_path = tmpfile.name
+            png = render_png(ticker, tuple(indicators), close_hash, start_date, end_date, fig)
+            image_data = base64.b64encode(png).decode('ascii')
 
-            with open(tmpfile_path, "rb") as image_file:
-                image_data = base64.b64encode(image_file.read()).decode('utf-8')
+            # Reuse the series stored while drawing the chart. The fallback only
+            # needs the last 10 values, and ~4 spans of warmup is enough for the
+            # EWMAs to converge to their full-series values
+            tail = data.iloc[-(max(26 * 4, 14 * 4) + 10):]
 
             tech_data = ""
             if "RSI" in indicators:
-                rsi = calculate_rsi(data)
+                rsi = st.session_state.get("rsi")
+                if rsi is None:
+                    rsi = calculate_rsi(tail)
                 recent_rsi = rsi.tail(10)
-                rsi_data = "\nRecent RSI values:"
-                for date, value in recent_rsi.items():
-                    rsi_data += f"\n{date.strftime('%Y-%m-%d')}: {value:.2f}"
+                dates = recent_rsi.index.strftime('%Y-%m-%d')
+                rsi_data = "\nRecent RSI values:\n" + "\n".join(
+                    f"{date}: {value:.2f}" for date, value in zip(dates, recent_rsi.to_numpy())
+                )
                 tech_data += rsi_data
 
             if "MACD" in indicators:
-                macd, signal = calculate_macd(data)
-                recent_data = pd.DataFrame({
-                    'MACD': macd.tail(10),
-                    'Signal': signal.tail(10)
-                })
-                macd_data = "\n\nRecent MACD values:"
-                for date, row in recent_data.iterrows():
-                    macd_data += f"\n{date.strftime('%Y-%m-%d')}: MACD={row['MACD']:.2f}, Signal={row['Signal']:.2f}"
+                macd, signal = st.session_state.get("macd"), st.session_state.get("signal")
+                if macd is None or signal is None:
+                    macd, signal = calculate_macd(tail)
+                dates = macd.index[-10:].strftime('%Y-%m-%d')
+                macd_data = "\n\nRecent MACD values:\n" + "\n".join(
+                    f"{date}: MACD={m:.2f}, Signal={sig:.2f}"
+                    for date, m, sig in zip(dates, macd.values[-10:], signal.values[-10:])
+                )
                 tech_data += macd_data
 
             messages = [{
@@ -204,9 +244,7 @@ if "stock_data" in st.session_state:
                 """,
                 'images': [image_data]
             }]
-            response = ollama.chat(model='llama3.2-vision', messages=messages)
+            stream = ollama.chat(model='llama3.2-vision', messages=messages, stream=True)
 
             st.write("**AI Analysis Results:**")
-            st.write(response["message"]["content"])
-
-            os.remove(tmpfile_path)
+            st.write_stream(chunk["message"]["content"] for chunk in stream)
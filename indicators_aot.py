@@ -0,0 +1,118 @@
+# Indicator kernel for dashboard.py, optionally compiled ahead of time.
+#
+# Run `python indicators_aot.py` once to build the _indicators_aot extension
+# next to this file. When it is present the dashboard uses it directly and
+# pays no JIT cost; otherwise the same kernel is compiled eagerly with Numba
+# on first import and cached on disk.
+
+import os
+import numpy as np
+from numba import njit
+
+SIGNATURE = "Tuple((f8[:], f8[:], f8[:], f8[:], f8[:], f8[:], f8[:], f8[:]))(f8[:], f8[:], i8, i8, i8, i8, i8, i8)"
+
+def _compute_indicators(close, volume, window, ema_span, macd_fast, macd_slow, macd_sig, rsi_win):
+    """Compute every chart indicator in a single pass over Close."""
+    n = close.shape[0]
+    sma = np.empty(n)
+    ema = np.empty(n)
+    bb_upper = np.empty(n)
+    bb_lower = np.empty(n)
+    vwap = np.empty(n)
+    rsi = np.empty(n)
+    macd = np.empty(n)
+    signal = np.empty(n)
+
+    a_ema = 2.0 / (ema_span + 1.0)
+    a_fast = 2.0 / (macd_fast + 1.0)
+    a_slow = 2.0 / (macd_slow + 1.0)
+    a_sig = 2.0 / (macd_sig + 1.0)
+
+    s = 0.0
+    ss = 0.0
+    ema_num = 0.0
+    ema_den = 0.0
+    fast = 0.0
+    slow = 0.0
+    sig = 0.0
+    pv = 0.0
+    vol = 0.0
+    gain = 0.0
+    loss = 0.0
+
+    for i in range(n):
+        x = close[i]
+
+        # SMA and Bollinger Bands from a rolling sum / sum of squares
+        s += x
+        ss += x * x
+        if i >= window:
+            old = close[i - window]
+            s -= old
+            ss -= old * old
+        if i >= window - 1:
+            mean = s / window
+            std = np.sqrt(max((ss - s * s / window) / (window - 1), 0.0))
+            sma[i] = mean
+            bb_upper[i] = mean + 2 * std
+            bb_lower[i] = mean - 2 * std
+        else:
+            sma[i] = np.nan
+            bb_upper[i] = np.nan
+            bb_lower[i] = np.nan
+
+        # EMA with pandas' default adjust=True weighting
+        ema_num = x + (1.0 - a_ema) * ema_num
+        ema_den = 1.0 + (1.0 - a_ema) * ema_den
+        ema[i] = ema_num / ema_den
+
+        # MACD and signal line (adjust=False recursion)
+        if i == 0:
+            fast = x
+            slow = x
+        else:
+            fast = a_fast * x + (1.0 - a_fast) * fast
+            slow = a_slow * x + (1.0 - a_slow) * slow
+        macd[i] = fast - slow
+        sig = macd[i] if i == 0 else a_sig * macd[i] + (1.0 - a_sig) * sig
+        signal[i] = sig
+
+        pv += x * volume[i]
+        vol += volume[i]
+        vwap[i] = pv / vol if vol != 0.0 else np.nan
+
+        # RSI from rolling sums of gains and losses
+        if i > 0:
+            d = x - close[i - 1]
+            if d > 0:
+                gain += d
+            else:
+                loss -= d
+        j = i - rsi_win
+        if j > 0:
+            d = close[j] - close[j - 1]
+            if d > 0:
+                gain -= d
+            else:
+                loss += d
+        if i >= rsi_win - 1 and loss != 0.0:
+            rsi[i] = 100.0 - 100.0 / (1.0 + gain / loss)
+        elif i >= rsi_win - 1 and gain != 0.0:
+            rsi[i] = 100.0
+        else:
+            rsi[i] = np.nan
+
+    return sma, ema, bb_upper, bb_lower, vwap, rsi, macd, signal
+
+try:
+    from _indicators_aot import compute_indicators
+except ImportError:
+    compute_indicators = njit(SIGNATURE, cache=True)(_compute_indicators)
+
+if __name__ == "__main__":
+    from numba.pycc import CC
+
+    cc = CC("_indicators_aot")
+    cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+    cc.export("compute_indicators", SIGNATURE)(_compute_indicators)
+    cc.compile()